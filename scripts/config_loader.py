@@ -0,0 +1,43 @@
+# scripts/config_loader.py
+import functools
+import json
+from pathlib import Path
+from typing import Dict
+
+# orjson 为可选依赖，未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CONFIG_FILE = BASE_DIR / "config" / "config.json"
+
+
+@functools.lru_cache(maxsize=1)
+def load_config() -> Dict:
+    """
+    从配置文件加载配置（同一进程内只读取、解析一次，各脚本共用）
+
+    Returns:
+        Dict: 配置字典
+    """
+    return loads(CONFIG_FILE.read_bytes())
+
+
+def loads(data: bytes):
+    """
+    解析 JSON 字节串（有 orjson 时使用 orjson）
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def dumps(obj, indent: bool = False) -> bytes:
+    """
+    序列化为 UTF-8 JSON 字节串（中文不转义），indent=True 时缩进 2 格
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
@@ -1,14 +1,15 @@
 # scripts/importer_alipay.py
-import sys
+import codecs
 import csv
+import functools
+import itertools
+import re
 from decimal import Decimal
 from datetime import datetime
 from pathlib import Path
 from dateutil import parser as date_parser
 
-sys.dont_write_bytecode = True
-
-ALIPAY_HEADER = [
+ALIPAY_HEADER = (
     "记录时间",
     "交易号",
     "交易对方",
@@ -17,7 +18,51 @@ ALIPAY_HEADER = [
     "来源",
     "备注",
     "标签",
-]
+)
+
+# 支付宝导出的交易时间格式，按常见程度排序；都不匹配时才交给 dateutil 推断
+ALIPAY_DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M",
+)
+
+# 交易成功状态（交易成功 / 已收入 等），编译一次供每行匹配
+SUCCESS_RE = re.compile("成功|已收")
+
+# 文件名关键词，合并为一个正则只扫描一遍文件名
+ALIPAY_NAME_RE = re.compile("|".join(re.escape(kw.lower()) for kw in [
+    "支付宝",
+    "alipay",
+    "ali-pay",
+    "zhifubao",
+]))
+
+
+def detect_encoding(file_path) -> str:
+    """
+    只读取文件开头 4KB 判断编码：有 BOM 或能按 UTF-8 解码时为 UTF-8，否则按支付宝默认的 GBK
+
+    Args:
+        file_path: 账单文件路径
+
+    Returns:
+        str: 用于 open() 的编码名称
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(4096)
+
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.isascii():
+        return "gbk"  # 纯 ASCII 无法区分，沿用默认编码
+    try:
+        # 增量解码器允许 4KB 边界处截断的多字节字符
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "gbk"
 
 
 def is_alipay_file(file_path: Path) -> bool:
@@ -29,24 +74,29 @@ def is_alipay_file(file_path: Path) -> bool:
 
     filename = file_path.name.lower()
 
-    name_keywords = [
-        "支付宝",
-        "alipay",
-        "ali-pay",
-        "zhifubao",
-    ]
-
     # ---------- 1️⃣ 文件名快速判断 ----------
-    for kw in name_keywords:
-        if kw.lower() in filename:
-            return True
+    if ALIPAY_NAME_RE.search(filename):
+        return True
 
     # ---------- 2️⃣ 表头兜底判断 ----------
     try:
-        with open(file_path, "r", encoding="gbk") as f:
+        stat = file_path.stat()
+    except OSError:
+        return False
+    # 文件未变化时直接复用上次的探测结果
+    return _has_alipay_header(str(file_path), stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=4096)
+def _has_alipay_header(path_str: str, mtime_ns: int, size: int) -> bool:
+    """在前10行内查找支付宝标准表头（按 路径+修改时间+大小 缓存结果）"""
+    try:
+        with open(path_str, "r", encoding=detect_encoding(path_str)) as f:
             for i, line in enumerate(f, start=1):
-                if i <= 10:  # 在前10行内查找表头
-                    return all(h in line for h in ALIPAY_HEADER)
+                if i > 10:  # 只在前10行内查找表头，不读取整个文件
+                    break
+                if all(h in line for h in ALIPAY_HEADER):
+                    return True
     except Exception:
         return False
 
@@ -56,56 +106,94 @@ def is_alipay_file(file_path: Path) -> bool:
 def parse_alipay(file_path: Path):
     transactions = []
 
-    # 1. 确保使用 GBK 编码
-    with open(file_path, "r", encoding="gbk") as f:
-        lines = f.readlines()
-
-    # 2. 找到真正的表头行 (包含 "交易时间" 或 "记录时间" 的那一行)
-    header_index = 0
-    for i, line in enumerate(lines):
-        if "交易时间" in line or "记录时间" in line:
-            header_index = i
-            break
-            
-    # 3. 将分隔符改为逗号，并使用 strip() 处理可能的空格
-    import io
-    content = "".join(lines[header_index:])
-    reader = csv.DictReader(io.StringIO(content)) 
-
-    for row in reader:
-        # 去掉 key 和 value 的前后空格
-        row = {k.strip(): v.strip() for k, v in row.items() if k}
-        
-        # 如果是空行或不包含金额，跳过
-        if not row.get("金额"):
-            continue
-
-        # 4. 优化状态判断逻辑，防止因为细微差异漏掉数据
-        status = row.get("交易状态", "")
-        if "成功" not in status and "已收" not in status:
-            continue
-
-        # ... 下方解析逻辑保持不变，但确保 key 对应正确 ...
-        date = date_parser.parse(row["交易时间"]).date()
-        amount = Decimal(row["金额"])
-
-
-        direction = "out" if row["收/支"] == "支出" else "in"
-
-        tx = {
-            "date": date,
-            "payee": row.get("交易对方", "").strip(),
-            "note": row.get("商品说明", "").strip() or row.get("备注", "").strip(),
-            "amount": amount,
-            "currency": "CNY",
-            "direction": direction,
-            "raw_category": row.get("标签", "").strip() or row.get("交易分类", "").strip(),
-            "raw_account": row.get("来源", "").strip() or row.get("账户", "").strip() or row.get("收/付款方式", "").strip(),
-            "source": "alipay",
-            "narration": row.get("备注", "").strip(),
-        }
-
-        transactions.append(tx)
+    # 1. 识别文件编码（支付宝导出通常为 GBK，也兼容 UTF-8 另存的账单）
+    with open(file_path, "r", encoding=detect_encoding(file_path), newline="") as f:
+        # 2. 找到真正的表头行 (包含 "交易时间" 或 "记录时间" 的那一行)
+        #    边读边找，找到后把表头行接回文件流交给 csv，不把整个文件读进内存
+        for line in f:
+            if "交易时间" in line or "记录时间" in line:
+                break
+        else:
+            return transactions
+
+        # 3. 将分隔符改为逗号，并使用 strip() 处理可能的空格
+        reader = csv.reader(itertools.chain([line], f))
+
+        # 表头只解析一次：列名 -> 列下标，数据行直接按下标取值，不再逐行构建 dict
+        header = [h.strip() for h in next(reader, [])]
+        columns = {name: i for i, name in enumerate(header) if name}
+
+        def lookup(*names):
+            # 每个字段的候选列只在表头中查找一次，得到实际存在的列下标
+            return tuple(columns[name] for name in names if name in columns)
+
+        amount_cols = lookup("金额")
+        status_cols = lookup("交易状态")
+        date_cols = lookup("交易时间")
+        direction_cols = lookup("收/支")
+        payee_cols = lookup("交易对方")
+        note_cols = lookup("商品说明", "备注")
+        category_cols = lookup("标签", "交易分类")
+        account_cols = lookup("来源", "账户", "收/付款方式")
+        narration_cols = lookup("备注")
+
+        def field(row, cols):
+            # 按候选列顺序取第一个非空值，只对实际用到的字段做 strip
+            for i in cols:
+                if i < len(row):
+                    value = row[i].strip()
+                    if value:
+                        return value
+            return ""
+
+        # 同一份账单的时间格式一致：识别一次后后续行直接 strptime
+        date_format = None
+
+        def parse_date(value):
+            nonlocal date_format
+            if date_format is not None:
+                try:
+                    return datetime.strptime(value, date_format).date()
+                except ValueError:
+                    pass
+            for fmt in ALIPAY_DATE_FORMATS:
+                try:
+                    parsed = datetime.strptime(value, fmt).date()
+                except ValueError:
+                    continue
+                date_format = fmt
+                return parsed
+            return date_parser.parse(value).date()
+
+        for row in reader:
+            # 如果是空行或不包含金额，跳过
+            amount_raw = field(row, amount_cols)
+            if not amount_raw:
+                continue
+
+            # 4. 优化状态判断逻辑，防止因为细微差异漏掉数据
+            if not SUCCESS_RE.search(field(row, status_cols)):
+                continue
+
+            date = parse_date(field(row, date_cols))
+            amount = Decimal(amount_raw)
+
+            direction = "out" if field(row, direction_cols) == "支出" else "in"
+
+            tx = {
+                "date": date,
+                "payee": field(row, payee_cols),
+                "note": field(row, note_cols),
+                "amount": amount,
+                "currency": "CNY",
+                "direction": direction,
+                "raw_category": field(row, category_cols),
+                "raw_account": field(row, account_cols),
+                "source": "alipay",
+                "narration": field(row, narration_cols),
+            }
+
+            transactions.append(tx)
 
     return transactions
 
@@ -1,21 +1,119 @@
-import sys
-import pandas as pd
-from decimal import Decimal
-from datetime import datetime
+import functools
+from decimal import Decimal, InvalidOperation
+from datetime import date
 from pathlib import Path
 import re
 import io
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
-sys.dont_write_bytecode = True
+from importer_common import AMOUNT_TRANS, EXCEL_ENGINE
 
 # Try to import PDF parsing library
+# 优先使用 pypdfium2（基于 PDFium 的 C++ 实现，文本提取快得多），否则回退到 PyPDF2
 try:
-    import PyPDF2
-    PDF_AVAILABLE = True
+    import pypdfium2 as pdfium
+    PDF_BACKEND = "pdfium"
 except ImportError:
-    PDF_AVAILABLE = False
-    print("警告: PyPDF2 未安装，PDF解析功能将不可用。请运行 'pip install PyPDF2' 安装。")
+    try:
+        import PyPDF2
+        PDF_BACKEND = "pypdf2"
+    except ImportError:
+        PDF_BACKEND = None
+        print("警告: PyPDF2 未安装，PDF解析功能将不可用。请运行 'pip install PyPDF2' 安装。")
+PDF_AVAILABLE = PDF_BACKEND is not None
+
+# 银行账单日期：2023-01-01 / 2023/1/1（可带时间部分），分隔符需前后一致
+DATE_RE = re.compile(r'(\d{4})([-/])(\d{1,2})\2(\d{1,2})')
+
+# PDF 行解析用的正则（模块加载时编译一次）
+# 一次匹配出 日期（2023年1月1日, 2023/1/1, 2023-01-01）、交易对方、两位小数的金额
+PDF_LINE_RE = re.compile(
+    r'(\d{4}[年/-]\d{1,2}[月/-]\d{1,2}日?)\s*(.*?)\s*(-?\d[\d,]*\.\d{2})(?!\d)'
+)
+# 宽松匹配：日期 + 其后任意格式的数字金额（正数支出或负数收入）
+PDF_DATE_RE = re.compile(r'\d{4}[年/-]\d{1,2}[月/-]\d{1,2}日?')
+PDF_AMOUNT_RE = re.compile(r'-?[\d,]+\.?\d+')
+
+# 支持的文件扩展名
+EXCEL_SUFFIXES = frozenset({'.xlsx', '.xls'})
+BANK_SUFFIXES = EXCEL_SUFFIXES | {'.pdf'}
+
+# 文件名中的银行关键词（排除通用词如"账单"，使用更具体的银行名称），合并为一个正则
+BANK_NAME_RE = re.compile('|'.join(re.escape(kw.lower()) for kw in [
+    "bank", "statement", "流水", "account",
+    "icbc", "cmb", "ccb", "boc", "abc", "中国银行", "建设银行",
+    "工商银行", "农业银行", "招商银行", "交通银行", "浦发银行",
+    "中信银行", "光大银行", "华夏银行", "民生银行", "平安银行",
+    "兴业银行", "广发银行", "邮储银行",
+]))
+
+# Excel 各字段可能的列名（支持中英文）
+BANK_COLUMN_NAMES = {
+    "date": ('交易日期', '交易时间', '日期', '时间', 'date', 'transaction_date'),
+    "amount": ('金额', '交易金额', 'amount', 'transaction_amount'),
+    "payee": ('交易对方', '对方户名', '收款人', '付款人', 'payee', 'counterparty'),
+    "note": ('摘要', '备注', '说明', 'description', 'note'),
+    "category": ('交易类型', '业务类型', 'type', 'category'),
+    "account": ('账户', '卡号', 'account', 'card_number'),
+}
+
+# 不超过该大小的Excel在内容探测时完整读取并缓存，供解析阶段复用
+EXCEL_CACHE_MAX_BYTES = 20 * 1024 * 1024
+
+# PDF 内容探测读取的页数
+PDF_PROBE_PAGES = 3
+
+# PDF 内容探测用的银行账单关键词，合并为一个正则只扫描一遍页面文本（英文不区分大小写）
+PDF_KEYWORD_RE = re.compile('|'.join(map(re.escape, [
+    "银行", "账户", "流水", "交易", "余额", "银行账单",
+    "account statement", "transaction", "balance",
+])), re.IGNORECASE)
+
+# Excel 内容探测用的银行账单常见列名，同样合并为一个正则
+EXCEL_HEADER_RE = re.compile('|'.join(map(re.escape, [
+    "交易日期", "交易时间", "日期", "时间", "金额", "余额",
+    "交易类型", "摘要", "交易流水号", "account", "date",
+    "amount", "balance", "type", "description",
+])))
+
+
+def iter_pdf_pages(file_path: Path, max_pages: Optional[int] = None):
+    """
+    逐页读取PDF，按可用的后端（pypdfium2 / PyPDF2）提取文本
+
+    Args:
+        file_path: PDF文件路径
+        max_pages: 最多读取的页数，None 表示全部
+
+    Yields:
+        (页码, 提取函数)：调用提取函数得到该页文本，单页出错不影响其他页
+    """
+    if PDF_BACKEND == "pdfium":
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            num_pages = len(pdf) if max_pages is None else min(max_pages, len(pdf))
+            for page_num in range(num_pages):
+                page = pdf[page_num]
+
+                def extract(page=page):
+                    textpage = page.get_textpage()
+                    try:
+                        return textpage.get_text_range()
+                    finally:
+                        textpage.close()
+
+                try:
+                    yield page_num, extract
+                finally:
+                    page.close()
+        finally:
+            pdf.close()
+    else:
+        with open(file_path, 'rb') as file:
+            pages = PyPDF2.PdfReader(file).pages
+            num_pages = len(pages) if max_pages is None else min(max_pages, len(pages))
+            for page_num in range(num_pages):
+                yield page_num, pages[page_num].extract_text
 
 def is_bank_file(file_path: Path) -> bool:
     """
@@ -26,37 +124,48 @@ def is_bank_file(file_path: Path) -> bool:
     filename = file_path.name.lower()
 
     # 检查文件扩展名
-    if file_path.suffix.lower() not in ['.pdf', '.xlsx', '.xls']:
+    if file_path.suffix.lower() not in BANK_SUFFIXES:
         return False
 
-    # 银行关键词（排除通用词如"账单"，使用更具体的银行名称）
-    bank_keywords = [
-        "bank", "statement", "流水", "account",
-        "icbc", "cmb", "ccb", "boc", "abc", "中国银行", "建设银行",
-        "工商银行", "农业银行", "招商银行", "交通银行", "浦发银行",
-        "中信银行", "光大银行", "华夏银行", "民生银行", "平安银行",
-        "兴业银行", "广发银行", "邮储银行"
- ]
-
     # 检查文件名是否包含银行关键词
-    for kw in bank_keywords:
-        if kw.lower() in filename:
-            return True
+    if BANK_NAME_RE.search(filename):
+        return True
 
-    # 如果文件名不包含关键词，尝试检查文件内容（仅对Excel文件）
-    if file_path.suffix.lower() in ['.xlsx', '.xls']:
+    # 如果文件名不包含关键词，检查文件内容；文件未变化时直接复用上次的探测结果
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return False
+    return _probe_bank_content(str(file_path), stat.st_mtime_ns, stat.st_size)
+
+@functools.lru_cache(maxsize=4096)
+def _probe_bank_content(path_str: str, mtime_ns: int, size: int) -> bool:
+    """
+    探测文件内容是否为银行账单（按 路径+修改时间+大小 缓存结果）
+
+    Args:
+        path_str: 文件路径
+        mtime_ns: 文件修改时间（纳秒），用于使缓存失效
+        size: 文件大小，用于使缓存失效
+
+    Returns:
+        bool: 是否为银行账单
+    """
+    file_path = Path(path_str)
+
+    # 检查Excel文件内容
+    if file_path.suffix.lower() in EXCEL_SUFFIXES:
         try:
-            df = pd.read_excel(file_path, dtype=str, nrows=20)  # 只读取前20行检查
+            if size <= EXCEL_CACHE_MAX_BYTES:
+                # 完整读取并缓存，识别为银行账单后 parse_xlsx_bank 直接复用，不再重复解析工作簿
+                df = _read_excel_cached(path_str, mtime_ns, size)
+            else:
+                import pandas as pd  # 延迟导入，仅 Excel 内容探测时需要
+                df = pd.read_excel(file_path, dtype=str, nrows=20, engine=EXCEL_ENGINE)  # 大文件只读取前20行检查
             # 检查是否包含银行账单常见的列名
-            common_headers = ["交易日期", "交易时间", "日期", "时间", "金额", "余额",
-                            "交易类型", "摘要", "交易流水号", "account", "date",
-                            "amount", "balance", "type", "description"]
-
             for col in df.columns:
-                col_str = str(col).lower()
-                for header in common_headers:
-                    if header in col_str:
-                        return True
+                if EXCEL_HEADER_RE.search(str(col).lower()):
+                    return True
         except Exception:
             pass  # 如果无法读取Excel文件，则返回False
 
@@ -64,20 +173,11 @@ def is_bank_file(file_path: Path) -> bool:
     elif file_path.suffix.lower() == '.pdf':
         if PDF_AVAILABLE:
             try:
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    # 检查前几页内容
-                    num_pages = min(3, len(pdf_reader.pages))
-                    for i in range(num_pages):
-                        page = pdf_reader.pages[i]
-                        text = page.extract_text()
-                        # 检查是否包含银行账单关键词
-                        bank_statement_keywords = ["银行", "账户", "流水", "交易", "余额",
-                                                 "银行账单", "account statement",
-                                                 "transaction", "balance"]
-                        for keyword in bank_statement_keywords:
-                            if keyword in text:
-                                return True
+                # 检查前几页内容（提取结果会被缓存，解析时不再重复提取）
+                for text in _pdf_head_texts(path_str, mtime_ns, size):
+                    # 检查是否包含银行账单关键词
+                    if PDF_KEYWORD_RE.search(text):
+                        return True
             except Exception:
                 pass  # 如果无法读取PDF文件，则返回False
         else:
@@ -85,6 +185,22 @@ def is_bank_file(file_path: Path) -> bool:
 
     return False
 
+@functools.lru_cache(maxsize=8)
+def _pdf_head_texts(path_str: str, mtime_ns: int, size: int) -> Tuple[str, ...]:
+    """
+    提取PDF前 PDF_PROBE_PAGES 页的文本（按 路径+修改时间+大小 缓存，供内容探测和解析共用）
+
+    Args:
+        path_str: PDF文件路径
+        mtime_ns: 文件修改时间（纳秒），用于使缓存失效
+        size: 文件大小，用于使缓存失效
+
+    Returns:
+        Tuple[str, ...]: 各页文本
+    """
+    return tuple(extract_text() for _, extract_text in
+                 iter_pdf_pages(Path(path_str), max_pages=PDF_PROBE_PAGES))
+
 def parse_pdf_bank(file_path: Path) -> List[Dict]:
     """
     解析PDF格式的银行账单
@@ -101,87 +217,76 @@ def parse_pdf_bank(file_path: Path) -> List[Dict]:
 
     transactions = []
 
+    # 内容探测时已提取过的前几页直接复用
+    head_texts: Tuple[str, ...] = ()
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-
-            # 银行账单常见的中文关键词
-            date_patterns = [
-                r'\d{4}[年/-]\d{1,2}[月/-]\d{1,2}日?',  # 2023年1月1日, 2023/1/1, 2023-01-01
-                r'\d{4}[年/-]\d{1,2}[月/-]\d{1,2}[日\s]',  # 包含日期的其他格式
-            ]
+        stat = file_path.stat()
+        head_texts = _pdf_head_texts(str(file_path), stat.st_mtime_ns, stat.st_size)
+    except Exception:
+        pass  # 提取失败时逐页处理，由下面的逐页异常处理报告
 
-            amount_patterns = [
-                r'[\d,]+\.?\d*',  # 数字金额
-            ]
-
-            # 遍历每一页
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    text = page.extract_text()
-
-                    # 按行分割文本
-                    lines = text.split('\n')
-
-                    for line in lines:
-                        # 尝试从行中提取交易信息
-                        # 这里需要根据实际银行账单格式进行调整
-                        # 以下是一个通用的解析方法
-                        line = line.strip()
-
-                        # 查找可能包含交易信息的行
-                        # 通常包含日期和金额
-                        for date_pattern in date_patterns:
-                            date_match = re.search(date_pattern, line)
-                            if date_match:
-                                # 在同一行中查找金额
-                                for amount_pattern in amount_patterns:
-                                    # 查找正数金额（支出）或负数金额（收入）
-                                    amount_matches = re.findall(r'-?[\d,]+\.?\d+', line)
-                                    if amount_matches:
-                                        # 提取第一个找到的金额
-                                        amount_str = amount_matches[0].replace(',', '')
-                                        try:
-                                            amount = Decimal(amount_str)
-                                            date_str = date_match.group()
-
-                                            # 解析日期
-                                            date_obj = parse_date_string(date_str)
-                                            if date_obj:
-                                                # 提取交易对方或摘要信息（通常在日期和金额附近）
-                                                # 这里需要根据实际银行账单格式进行调整
-                                                # 简化处理：提取日期和金额之间的文本作为交易对方
-                                                parts = re.split(r'[\d,]+\.?\d+', line)
-                                                payee = ""
-                                                if len(parts) > 0:
-                                                    # 在日期后，金额前的部分可能是交易对方
-                                                    date_pos = line.find(date_str)
-                                                    amount_pos = line.find(amount_matches[0])
-                                                    if date_pos >= 0 and amount_pos >= 0:
-                                                        payee = line[date_pos + len(date_str):amount_pos].strip()
-
-                                                # 如果没有找到交易对方，使用整行作为备注
-                                                if not payee:
-                                                    payee = "银行交易"
-
-                                                transactions.append({
-                                                    "date": date_obj,
-                                                    "payee": payee,
-                                                    "amount": abs(amount),  # 使用绝对值，方向由其他字段确定
-                                                    "note": f"PDF页{page_num + 1}: {line}",
-                                                    "raw_category": "银行交易",
-                                                    "raw_account": "银行账户"
-                                                })
-                                        except ValueError:
-                                            # 金额转换失败，跳过此行
-                                            continue
-                                        except Exception as e:
-                                            print(f"处理金额时出错: {e}")
-                                            continue
-                                    break  # 只处理第一个找到的金额
-                except Exception as e:
-                    print(f"处理PDF页面 {page_num + 1} 时出错: {e}")
-                    continue  # 继续处理下一页
+    try:
+        # 遍历每一页
+        for page_num, extract_text in iter_pdf_pages(file_path):
+            try:
+                if page_num < len(head_texts):
+                    text = head_texts[page_num]
+                else:
+                    text = extract_text()
+
+                # 按行分割文本
+                lines = text.split('\n')
+
+                for line in lines:
+                    # 尝试从行中提取交易信息
+                    # 这里需要根据实际银行账单格式进行调整
+                    # 以下是一个通用的解析方法
+                    line = line.strip()
+
+                    # 查找可能包含交易信息的行：日期、交易对方、金额一次匹配
+                    line_match = PDF_LINE_RE.search(line)
+                    if line_match:
+                        date_str, payee, amount_str = line_match.groups()
+                    else:
+                        # 金额不是两位小数时退回宽松匹配，金额只在日期之后查找
+                        date_match = PDF_DATE_RE.search(line)
+                        if not date_match:
+                            continue
+                        amount_match = PDF_AMOUNT_RE.search(line, date_match.end())
+                        if not amount_match:
+                            continue
+                        date_str = date_match.group()
+                        amount_str = amount_match.group()
+                        # 提取日期和金额之间的文本作为交易对方
+                        payee = line[date_match.end():amount_match.start()].strip()
+
+                    try:
+                        # 提取第一个找到的金额
+                        amount = Decimal(amount_str.replace(',', ''))
+                    except InvalidOperation:
+                        # 金额转换失败，跳过此行
+                        continue
+
+                    # 解析日期
+                    date_obj = parse_date_string(date_str)
+                    if not date_obj:
+                        continue
+
+                    # 如果没有找到交易对方，使用默认值
+                    if not payee:
+                        payee = "银行交易"
+
+                    transactions.append({
+                        "date": date_obj,
+                        "payee": payee,
+                        "amount": abs(amount),  # 使用绝对值，方向由其他字段确定
+                        "note": f"PDF页{page_num + 1}: {line}",
+                        "raw_category": "银行交易",
+                        "raw_account": "银行账户"
+                    })
+            except Exception as e:
+                print(f"处理PDF页面 {page_num + 1} 时出错: {e}")
+                continue  # 继续处理下一页
     except FileNotFoundError:
         print(f"错误: 找不到PDF文件: {file_path}")
         return []
@@ -191,7 +296,7 @@ def parse_pdf_bank(file_path: Path) -> List[Dict]:
 
     return transactions
 
-def parse_date_string(date_str: str) -> Optional[datetime.date]:
+def parse_date_string(date_str: str) -> Optional[date]:
     """
     解析日期字符串
 
@@ -199,30 +304,40 @@ def parse_date_string(date_str: str) -> Optional[datetime.date]:
         date_str: 日期字符串
 
     Returns:
-        Optional[datetime.date]: 解析后的日期，如果失败则返回None
+        Optional[date]: 解析后的日期，如果失败则返回None
     """
-    # 移除可能的中文字符并标准化格式
+    # 移除可能的中文字符并标准化格式，只保留日期部分
     date_str = date_str.replace('年', '-').replace('月', '-').replace('日', '')
+    match = DATE_RE.fullmatch(date_str.strip().split(' ', 1)[0])
+    if not match:
+        return None
 
     try:
-        # 尝试多种日期格式
-        formats = [
-            '%Y-%m-%d',
-            '%Y/%m/%d',
-            '%Y-%m-%d',
-            '%Y/%m/%d %H:%M:%S',
-            '%Y-%m-%d %H:%M:%S'
-        ]
-
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt).date()
-            except ValueError:
-                continue
-    except:
-        pass
+        return date(int(match.group(1)), int(match.group(3)), int(match.group(4)))
+    except ValueError:
+        return None  # 日期不存在，例如 2023-02-30
 
-    return None
+def read_excel(file_path: Path):
+    """
+    读取Excel文件为字符串类型的DataFrame，文件未变化时复用已缓存的读取结果
+
+    Args:
+        file_path: Excel文件路径
+
+    Returns:
+        DataFrame: 读取结果（可能为共享的缓存对象，调用方不要原地修改）
+    """
+    stat = file_path.stat()
+    if stat.st_size > EXCEL_CACHE_MAX_BYTES:
+        import pandas as pd
+        return pd.read_excel(file_path, dtype=str, engine=EXCEL_ENGINE)
+    return _read_excel_cached(str(file_path), stat.st_mtime_ns, stat.st_size)
+
+@functools.lru_cache(maxsize=4)
+def _read_excel_cached(path_str: str, mtime_ns: int, size: int):
+    """按 路径+修改时间+大小 缓存完整读取的DataFrame"""
+    import pandas as pd
+    return pd.read_excel(path_str, dtype=str, engine=EXCEL_ENGINE)
 
 def parse_xlsx_bank(file_path: Path) -> List[Dict]:
     """
@@ -234,88 +349,74 @@ def parse_xlsx_bank(file_path: Path) -> List[Dict]:
     Returns:
         List[Dict]: 交易记录列表
     """
+    # 延迟导入 pandas，识别其它类型账单时无需加载
+    import pandas as pd
+
     transactions = []
 
     try:
-        # 读取Excel文件
-        df = pd.read_excel(file_path, dtype=str)
+        # 读取Excel文件（内容探测时已读取过则直接复用）
+        df = read_excel(file_path)
 
         if df.empty:
             print(f"警告: Excel文件为空: {file_path.name}")
             return transactions
 
-        # 尝试识别列名（支持中英文）
-        date_cols = ['交易日期', '交易时间', '日期', '时间', 'date', 'transaction_date']
-        amount_cols = ['金额', '交易金额', 'amount', 'transaction_amount']
-        payee_cols = ['交易对方', '对方户名', '收款人', '付款人', 'payee', 'counterparty']
-        note_cols = ['摘要', '备注', '说明', 'description', 'note']
-        category_cols = ['交易类型', '业务类型', 'type', 'category']
-        account_cols = ['账户', '卡号', 'account', 'card_number']
-
-        # 查找实际的列名
-        date_col = find_column_name(df, date_cols)
-        amount_col = find_column_name(df, amount_cols)
-        payee_col = find_column_name(df, payee_cols)
-        note_col = find_column_name(df, note_cols)
-        category_col = find_column_name(df, category_cols)
-        account_col = find_column_name(df, account_cols)
+        # 查找实际的列名（所有字段一次解析，列名只规范化一次）
+        columns = resolve_columns(df.columns, BANK_COLUMN_NAMES)
+        date_col = columns["date"]
+        amount_col = columns["amount"]
+        payee_col = columns["payee"]
+        note_col = columns["note"]
+        category_col = columns["category"]
+        account_col = columns["account"]
 
         if not date_col or not amount_col:
             print(f"警告: 未找到日期或金额列，可能无法正确解析文件: {file_path.name}")
             return transactions
 
-        # 遍历每一行数据
-        for idx, row in df.iterrows():
-            try:
-                # 检查必要字段是否存在
-                date_raw = row.get(date_col, "")
-                if pd.isna(date_raw) or date_raw == "":
-                    continue  # 跳过空行
+        # 整列过滤日期或金额为空的行，避免 iterrows() 逐行构造 Series
+        df = df[df[date_col].notna() & df[amount_col].notna()]
 
-                # 解析日期
-                date_obj = parse_date_string(str(date_raw))
-                if not date_obj:
-                    continue  # 日期解析失败，跳过此行
+        # 解析日期：同一账单中日期重复度高，只对去重后的值解析一次
+        date_lookup = {v: parse_date_string(v) for v in df[date_col].unique()}
+        dates = [date_lookup[v] for v in df[date_col]]
 
-                # 解析金额
-                amount_raw = str(row.get(amount_col, "")).replace("¥", "").replace(",", "").replace(" ", "")
-                if amount_raw == "":
-                    continue  # 金额为空，跳过此行
+        # 解析金额：整列去除货币符号/千分位/空格
+        amounts = df[amount_col].str.translate(AMOUNT_TRANS)
 
-                try:
-                    # 处理正负号，银行流水可能有正负号表示收入/支出
-                    amount = Decimal(amount_raw)
-                except ValueError:
-                    print(f"警告: 第{idx+1}行金额格式错误: {amount_raw}")
-                    continue  # 金额转换失败，跳过此行
-
-                # 获取交易对方
-                payee = str(row.get(payee_col, "")).strip() if payee_col else "银行交易"
-
-                # 获取备注
-                note = str(row.get(note_col, "")).strip() if note_col else ""
-
-                # 获取交易类型
-                category = str(row.get(category_col, "")).strip() if category_col else "银行交易"
-
-                # 获取账户信息
-                account = str(row.get(account_col, "")).strip() if account_col else "银行账户"
-
-                # 添加到交易列表
-                transactions.append({
-                    "date": date_obj,
-                    "payee": payee,
-                    "amount": abs(amount),  # 使用绝对值，方向由其他字段确定
-                    "note": note,
-                    "raw_category": category,
-                    "raw_account": account
-                })
-            except KeyError as e:
-                print(f"警告: 第{idx+1}行数据格式错误，跳过该行: {e}")
-                continue
-            except Exception as e:
-                print(f"警告: 处理第{idx+1}行时出错，跳过该行: {e}")
-                continue
+        # 取出各列为列表，缺失的列使用默认值
+        def column_values(col, default):
+            if not col:
+                return [default] * len(df)
+            return df[col].fillna("").str.strip().tolist()
+
+        payees = column_values(payee_col, "银行交易")
+        notes = column_values(note_col, "")
+        categories = column_values(category_col, "银行交易")
+        accounts = column_values(account_col, "银行账户")
+
+        for idx, date_obj, amount_raw, payee, note, category, account in zip(
+                df.index, dates, amounts, payees, notes, categories, accounts):
+            if not date_obj or not amount_raw:
+                continue  # 日期解析失败或金额为空，跳过此行
+
+            try:
+                # 处理正负号，银行流水可能有正负号表示收入/支出
+                amount = Decimal(amount_raw)
+            except InvalidOperation:
+                print(f"警告: 第{idx+1}行金额格式错误: {amount_raw}")
+                continue  # 金额转换失败，跳过此行
+
+            # 添加到交易列表
+            transactions.append({
+                "date": date_obj,
+                "payee": payee,
+                "amount": abs(amount),  # 使用绝对值，方向由其他字段确定
+                "note": note,
+                "raw_category": category,
+                "raw_account": account
+            })
 
     except FileNotFoundError:
         print(f"错误: 找不到Excel文件: {file_path}")
@@ -329,24 +430,43 @@ def parse_xlsx_bank(file_path: Path) -> List[Dict]:
 
     return transactions
 
-def find_column_name(df, possible_names):
+def resolve_columns(columns, column_names: Dict[str, tuple]) -> Dict[str, Optional[str]]:
     """
-    在DataFrame中查找匹配的列名
+    一次性为所有字段查找匹配的列名
 
     Args:
-        df: DataFrame
+        columns: DataFrame 的列名
+        column_names: 字段 -> 可能的列名
+
+    Returns:
+        Dict[str, Optional[str]]: 字段 -> 找到的列名，没找到则为None
+    """
+    # 列名只做一次 strip / lower
+    normalized = [(col, str(col).strip().lower()) for col in columns]
+    return {field: find_column_name(normalized, names) for field, names in column_names.items()}
+
+def find_column_name(normalized_columns, possible_names):
+    """
+    在列名中查找匹配的列名
+
+    Args:
+        normalized_columns: (原列名, 规范化后的小写列名) 列表
         possible_names: 可能的列名列表
 
     Returns:
         str or None: 找到的列名，如果没找到则返回None
     """
-    for col in df.columns:
-        col_str = str(col).strip()
-        for name in possible_names:
-            if name.lower() in col_str.lower():
-                return col
+    pattern = _column_name_re(tuple(possible_names))
+    for col, col_lower in normalized_columns:
+        if pattern.search(col_lower):
+            return col
     return None
 
+@functools.lru_cache(maxsize=32)
+def _column_name_re(possible_names: tuple):
+    """把候选列名合并为一个正则（小写），每个列名只需扫描一次"""
+    return re.compile('|'.join(re.escape(name.lower()) for name in possible_names))
+
 def parse_bank(file_path: Path) -> List[Dict]:
     """
     解析银行账单主函数
@@ -368,7 +488,7 @@ def parse_bank(file_path: Path) -> List[Dict]:
     try:
         if file_path.suffix.lower() == '.pdf':
             return parse_pdf_bank(file_path)
-        elif file_path.suffix.lower() in ['.xlsx', '.xls']:
+        elif file_path.suffix.lower() in EXCEL_SUFFIXES:
             return parse_xlsx_bank(file_path)
         else:
             print(f"   [错误] 不支持的文件格式: {file_path.suffix}")
@@ -0,0 +1,33 @@
+# scripts/importer_common.py
+# 各账单解析器共用的常量（不依赖 pandas / PDF 库，导入开销很小）
+import importlib.util
+import re
+from typing import Optional
+
+# 金额中需要去除的货币符号、千分位与空格（单次 translate 完成）
+AMOUNT_TRANS = str.maketrans("", "", "¥￥$, ")
+
+
+def _pick_excel_engine() -> Optional[str]:
+    """
+    已安装 python-calamine（Rust 实现）且 pandas >= 2.2 时用它读取 Excel，比默认的 openpyxl 快数倍；
+    只查询 pandas 版本号，不导入 pandas
+
+    Returns:
+        Optional[str]: "calamine"，或 None（使用 pandas 默认引擎）
+    """
+    if importlib.util.find_spec("python_calamine") is None:
+        return None
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # Python 3.7（pandas 也不可能 >= 2.2）
+        return None
+    try:
+        pandas_version = tuple(int(part) for part in re.findall(r'\d+', version("pandas"))[:2])
+    except PackageNotFoundError:
+        return None
+    # pandas 2.2 之前不认识 engine="calamine"，会让所有 Excel 导入报 ValueError
+    return "calamine" if pandas_version >= (2, 2) else None
+
+
+EXCEL_ENGINE = _pick_excel_engine()
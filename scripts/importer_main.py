@@ -1,60 +1,80 @@
-import sys
 import argparse
-import json
+import functools
+from collections import defaultdict
 import os
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-
-sys.dont_write_bytecode = True
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
 
 # 导入自定义模块
+from config_loader import BASE_DIR, load_config
 from importer_alipay import is_alipay_file, parse_alipay
 from importer_wechat import is_wechat_file, parse_wechat
 from importer_bank import is_bank_file, parse_bank
-from memory_brain import MemoryBrain
+
+if TYPE_CHECKING:
+    from memory_brain import MemoryBrain
 
 # ---------- 初始化配置 ----------
-BASE_DIR = Path(__file__).resolve().parent.parent
-CONFIG_FILE = BASE_DIR / "config" / "config.json"
+# 配置与 MemoryBrain 均在首次使用时才加载，导入本模块不产生磁盘 I/O
 
-def load_config() -> Dict:
+@functools.lru_cache(maxsize=1)
+def get_asset_mapping() -> Tuple[Tuple[str, str], ...]:
     """
-    从配置文件加载配置
+    获取资产映射
 
     Returns:
-        Dict: 配置字典
+        Tuple[Tuple[str, str], ...]: 预先转小写的 (关键词, 资产账户)，避免每条交易重复 lower()
     """
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-config = load_config()
-
-# 资产映射与目录配置
-ASSET_MAPPING = config.get("asset_mapping", {})
-MONTHLY_DIR_NAME = config.get('monthly_dir', 'data')
-MONTHLY_DIR = BASE_DIR / MONTHLY_DIR_NAME
-MAIN_LEDGER = BASE_DIR / config.get("main_bean_file", "main.beancount")
+    asset_mapping = load_config().get("asset_mapping", {})
+    return tuple((kw.lower(), acc) for kw, acc in asset_mapping.items())
 
-brain = MemoryBrain()
+def get_monthly_dir_name() -> str:
+    """获取月度分卷目录名（相对项目根目录）"""
+    return load_config().get("monthly_dir", "data")
 
-# ---------- 工具函数 ----------
+def get_main_ledger() -> Path:
+    """获取主账本路径"""
+    return BASE_DIR / load_config().get("main_bean_file", "main.beancount")
 
-def ensure_dir(file_path: str) -> None:
+@functools.lru_cache(maxsize=1)
+def get_brain() -> "MemoryBrain":
     """
-    确保目标文件的目录存在
+    获取共享的 MemoryBrain 实例
 
-    Args:
-        file_path: 文件路径
+    Returns:
+        MemoryBrain: 首次调用时创建，之后复用
     """
-    try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    except OSError as e:
-        print(f"   [错误] 创建目录失败: {e}")
-        raise
+    # memory_brain 在导入时读取配置，延迟到首次使用时再导入
+    from memory_brain import MemoryBrain
+    return MemoryBrain()
+
+# 账单导入器注册表：(账单名称, 支持的扩展名, 识别函数, 解析函数)，按顺序匹配
+IMPORTERS = (
+    ("支付宝", (".csv",), is_alipay_file, parse_alipay),
+    ("微信", (".xlsx", ".xls"), is_wechat_file, parse_wechat),
+    ("银行", (".pdf", ".xlsx", ".xls"), is_bank_file, parse_bank),
+)
+
+# 按扩展名索引导入器，只探测可能匹配的导入器，避免无关的文件读取
+IMPORTERS_BY_SUFFIX: Dict[str, List[tuple]] = {}
+for _importer in IMPORTERS:
+    for _suffix in _importer[1]:
+        IMPORTERS_BY_SUFFIX.setdefault(_suffix, []).append(_importer)
+
+# Beancount 分录模板（模块加载时构建一次）；金额按定点格式输出，避免 Decimal 的科学计数法（如 1E+2）
+ENTRY_FORMAT = '{date} * "{payee}"\n  {expense}  {amount:f} CNY\n  {asset}\n\n'
+
+# 主账本中已有的行（去除首尾空白），首次更新主账本时读取一次，之后在内存中维护
+_INCLUDES: Optional[Set[str]] = None
+# 主账本末尾是否缺少换行，追加 include 前需要先补一个
+_LEDGER_NEEDS_NEWLINE = False
+
+# ---------- 工具函数 ----------
 
+@functools.lru_cache(maxsize=256)
 def detect_asset_account(raw_account: str) -> str:
     """
-    根据账单支付方式识别资产账户
+    根据账单支付方式识别资产账户（支付方式种类很少，按原始值缓存识别结果）
 
     Args:
         raw_account: 原始账户信息
@@ -64,37 +84,84 @@ def detect_asset_account(raw_account: str) -> str:
     """
     if not raw_account:
         return "Assets:FixMe"
-    for keyword, account in ASSET_MAPPING.items():
-        if keyword.lower() in raw_account.lower():
+    raw_account_lower = raw_account.lower()
+    for keyword, account in get_asset_mapping():
+        if keyword in raw_account_lower:
             return account
     return "Assets:FixMe"
 
-def update_main_ledger(rel_path: str) -> None:
+def escape_beancount_string(value: str) -> str:
+    """
+    转义 Beancount 字符串中的反斜杠和双引号
+
+    Args:
+        value: 原始字符串
+
+    Returns:
+        str: 可放入双引号内的字符串，不含需要转义的字符时直接返回原字符串
+    """
+    if '"' not in value and '\\' not in value:
+        return value
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+def update_main_ledger(rel_paths: List[str]) -> None:
     """
-    在主账本中追加 include 语句
+    在主账本中追加 include 语句（主账本只在首次调用时读取，之后只追加）
 
     Args:
-        rel_path: 相对路径
+        rel_paths: 相对路径列表
     """
-    # 统一路径格式为斜杠，适配 Beancount 语法
-    formatted_path = rel_path.replace('\\', '/')
-    include_line = f'include "{formatted_path}"'
+    global _INCLUDES, _LEDGER_NEEDS_NEWLINE
 
+    main_ledger = get_main_ledger()
     try:
-        content = ""
-        if MAIN_LEDGER.exists():
-            content = MAIN_LEDGER.read_text(encoding="utf-8")
-
-        if include_line not in content:
-            with open(MAIN_LEDGER, "a", encoding="utf-8") as f:
-                if content and not content.endswith('\n'):
-                    f.write("\n")
-                f.write(f"{include_line}\n")
-            print(f"   [系统] 🔗 已在主账本中关联新文件: {formatted_path}")
+        if _INCLUDES is None:
+            content = ""
+            if main_ledger.exists():
+                content = main_ledger.read_text(encoding="utf-8")
+            _INCLUDES = {line.strip() for line in content.splitlines()}
+            _LEDGER_NEEDS_NEWLINE = bool(content) and not content.endswith('\n')
+
+        new_paths = []
+        for rel_path in rel_paths:
+            # 统一路径格式为斜杠，适配 Beancount 语法
+            formatted_path = rel_path.replace('\\', '/')
+            include_line = f'include "{formatted_path}"'
+            if include_line not in _INCLUDES:
+                _INCLUDES.add(include_line)
+                new_paths.append(formatted_path)
+
+        if not new_paths:
+            return
+
+        with open(main_ledger, "a", encoding="utf-8") as f:
+            if _LEDGER_NEEDS_NEWLINE:
+                f.write("\n")
+            f.writelines(f'include "{path}"\n' for path in new_paths)
+        _LEDGER_NEEDS_NEWLINE = False
+        for path in new_paths:
+            print(f"   [系统] 🔗 已在主账本中关联新文件: {path}")
     except IOError as e:
+        # 写入失败时内存中的集合可能与文件不一致，下次调用重新读取
+        _INCLUDES = None
         print(f"   [错误] 更新主账本失败: {e}")
         raise
 
+def find_importer(file_path: Path) -> Optional[tuple]:
+    """
+    根据扩展名和识别函数查找匹配的导入器
+
+    Args:
+        file_path: 账单文件路径
+
+    Returns:
+        Optional[tuple]: 匹配的 (账单名称, 扩展名, 识别函数, 解析函数)，无法识别时返回 None
+    """
+    for importer in IMPORTERS_BY_SUFFIX.get(file_path.suffix.lower(), ()):
+        if importer[2](file_path):
+            return importer
+    return None
+
 # ---------- 主逻辑 ----------
 
 def process_transaction(tx: Dict) -> Tuple[str, str]:
@@ -111,7 +178,7 @@ def process_transaction(tx: Dict) -> Tuple[str, str]:
     asset_account = detect_asset_account(tx["raw_account"])
 
     # 获取支出账户（通过 brain.classify 触发 AI 建议与人工确认）
-    expense_account = brain.classify(
+    expense_account = get_brain().classify(
         payee=tx["payee"],
         raw_category=tx["raw_category"],
         note=tx["note"],
@@ -119,10 +186,12 @@ def process_transaction(tx: Dict) -> Tuple[str, str]:
     )
 
     # 构造 Beancount 分录字符串
-    entry_str = (
-        f'{tx["date"]} * "{tx["payee"]}"\n'
-        f'  {expense_account}  {tx["amount"]} CNY\n'
-        f'  {asset_account}\n\n'
+    entry_str = ENTRY_FORMAT.format(
+        date=tx["date"],
+        payee=escape_beancount_string(tx["payee"]),
+        expense=expense_account,
+        amount=tx["amount"],
+        asset=asset_account,
     )
 
     return asset_account, entry_str
@@ -142,18 +211,14 @@ def main(csv_file: str) -> bool:
 
     # 1. 识别并解析文件
     try:
-        if is_alipay_file(file_path):
-            print(f"   [系统] 识别为支付宝账单: {file_path.name}")
-            txs = parse_alipay(file_path)
-        elif is_wechat_file(file_path):
-            print(f"   [系统] 识别为微信账单: {file_path.name}")
-            txs = parse_wechat(file_path)
-        elif is_bank_file(file_path):
-            print(f"   [系统] 识别为银行账单: {file_path.name}")
-            txs = parse_bank(file_path)
-        else:
+        importer = find_importer(file_path)
+        if importer is None:
             print(f"   [系统] 无法识别账单类型: {file_path.name}")
             return False
+
+        label, _, _, parser = importer
+        print(f"   [系统] 识别为{label}账单: {file_path.name}")
+        txs = parser(file_path)
     except Exception as e:
         print(f"   [错误] 解析文件失败: {e}")
         return False
@@ -163,10 +228,14 @@ def main(csv_file: str) -> bool:
         return False
 
     # 2. 准备容器
-    entries_by_month: Dict[str, List[str]] = {}  # 格式: {"202512": ["entry1...", "entry2..."]}
+    entries_by_month: Dict[str, List[str]] = defaultdict(list)  # 格式: {"202512": ["entry1...", "entry2..."]}
     total_count = 0
 
     print(f"   [系统] 共解析到 {len(txs)} 条交易。")
+
+    # 批量获取新商户的 AI 建议，避免逐条请求
+    brain = get_brain()
+    brain.prefetch(txs)
     print("--------------------------------------------------")
 
     # 3. 遍历交易（此处包含人工确认步骤）
@@ -175,12 +244,9 @@ def main(csv_file: str) -> bool:
             # 处理交易
             _, entry_str = process_transaction(tx)
 
-            # 按月份分组存储
-            month_key = tx["date"].strftime("%Y%m")
-            if month_key not in entries_by_month:
-                entries_by_month[month_key] = []
-
-            entries_by_month[month_key].append(entry_str)
+            # 按月份分组存储（直接拼接年月，比 strftime 快）
+            tx_date = tx["date"]
+            entries_by_month[f"{tx_date.year}{tx_date.month:02d}"].append(entry_str)
             total_count += 1
         except KeyError as e:
             print(f"   [错误] 交易数据格式错误，跳过该条记录: {e}")
@@ -192,22 +258,34 @@ def main(csv_file: str) -> bool:
     print("--------------------------------------------------")
     # 4. 执行批量写入逻辑
     if entries_by_month:
+        monthly_dir_name = get_monthly_dir_name()
+        monthly_dir = BASE_DIR / monthly_dir_name
+
+        # 所有分卷都在同一目录下，只需创建一次
+        try:
+            monthly_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"   [错误] 创建目录失败: {e}")
+            raise
+
+        rel_paths = []
         for month, entries in entries_by_month.items():
             # 确定分卷文件路径 (例如: data/202512.beancount)
-            target_file = os.path.join(MONTHLY_DIR, f"{month}.beancount")
-            ensure_dir(target_file)
+            target_file = monthly_dir / f"{month}.beancount"
 
-            # 追加写入月份文件
+            # 追加写入月份文件（拼接后一次写入，使用较大的写缓冲）
             try:
-                with open(target_file, 'a', encoding='utf-8') as f:
-                    f.writelines(entries)
+                with open(target_file, 'a', encoding='utf-8', buffering=1 << 20) as f:
+                    f.write("".join(entries))
             except IOError as e:
                 print(f"   [错误] 写入文件失败: {e}")
                 continue
 
             # 构造相对路径用于 include
-            rel_path = os.path.join(MONTHLY_DIR_NAME, f"{month}.beancount")
-            update_main_ledger(rel_path)
+            rel_paths.append(os.path.join(monthly_dir_name, f"{month}.beancount"))
+
+        # 所有月份写完后统一更新主账本
+        update_main_ledger(rel_paths)
 
         # 分类完成后统一保存 AI 映射缓存（mapping.json）
         try:
@@ -1,79 +1,104 @@
-import sys
-import pandas as pd
-from decimal import Decimal
-from datetime import datetime
+import re
+from decimal import Decimal, InvalidOperation
 from pathlib import Path
 
-sys.dont_write_bytecode = True
+from importer_common import AMOUNT_TRANS, EXCEL_ENGINE
+
+# 常见成功状态关键词（模块加载时编译为一个正则，整列匹配）
+SUCCESS_RE = re.compile("成功|已收|已转|已送出")
 
 def is_wechat_file(file_path: Path) -> bool:
     filename = file_path.name.lower()
     return "微信" in filename or "wechat" in filename
 
 def parse_wechat(file_path: Path):
+    # 延迟导入 pandas，识别其它类型账单时无需加载
+    import pandas as pd
+
     # 使用 pandas 读取 Excel
     try:
-        # 微信 Excel 账单头部通常有几行统计信息，先读入 DataFrame
-        df_raw = pd.read_excel(file_path, dtype=str)
+        # 微信 Excel 账单头部通常有几行统计信息，不指定表头整表读入一次
+        df_raw = pd.read_excel(file_path, dtype=str, header=None, engine=EXCEL_ENGINE)
     except Exception as e:
         print(f"   [错误] 无法读取 Excel 文件: {e}")
         return []
 
-    # 1. 定位标题行（寻找包含“交易时间”的那一行作为表头）
-    header_row_index = -1
-    for i, row in df_raw.iterrows():
-        if "交易时间" in row.values:
-            header_row_index = i
-            break
-    
+    # 1. 定位标题行（寻找包含“交易时间”的那一行作为表头），整表一次比较，不逐行构造 Series
+    header_matches = (df_raw.to_numpy() == "交易时间").any(axis=1)
+    header_row_index = int(header_matches.argmax()) if header_matches.any() else -1
+
     if header_row_index == -1:
         print("   [错误] 未能在 Excel 中找到“交易时间”列，请确认文件是否为微信导出的账单。")
         return []
 
-    # 2. 重新读取数据，跳过标题行之前的说明文字
-    df = pd.read_excel(file_path, skiprows=header_row_index + 1)
-    
-    # 清理列名（去除首尾空格）
-    df.columns = [str(c).strip() for c in df.columns]
+    # 2. 在已读入的数据中截取标题行之后的部分，跳过标题行之前的说明文字，无需重新读取
+    df = df_raw.iloc[header_row_index + 1:]
+
+    # 以标题行作为列名（去除首尾空格）
+    df.columns = [str(c).strip() for c in df_raw.iloc[header_row_index]]
 
     transactions = []
-    
-    for _, row in df.iterrows():
-        # 过滤掉金额或时间为空的行（通常是底部的统计行）
-        if pd.isna(row.get("金额(元)")) or pd.isna(row.get("交易时间")):
-            continue
-        
-        # 状态过滤：只处理支付成功、已转账、已收钱等成功状态
-        status = str(row.get("当前状态", "")).strip()
-        # 常见成功状态关键词
-        success_keywords = ["成功", "已收", "已转", "已送出"]
-        if not any(kw in status for kw in success_keywords):
-            continue
 
-        # 处理金额：去除人民币符号、逗号，转为 Decimal
-        amount_raw = str(row.get("金额(元)")).replace("¥", "").replace(",", "").strip()
+    # 金额或时间列缺失时没有可导入的行
+    if "金额(元)" not in df.columns or "交易时间" not in df.columns or "当前状态" not in df.columns:
+        return transactions
+
+    # 过滤掉金额或时间为空的行（通常是底部的统计行）
+    df = df.dropna(subset=["金额(元)", "交易时间"])
+
+    # 状态过滤：只处理支付成功、已转账、已收钱等成功状态（整列匹配）
+    status = df["当前状态"].fillna("").str.strip()
+    df = df[status.str.contains(SUCCESS_RE)]
+    if df.empty:
+        return transactions
+
+    # 处理金额：整列去除人民币符号、逗号
+    amounts = df["金额(元)"].str.translate(AMOUNT_TRANS).str.strip()
+
+    # 处理日期：按 dtype=str 读入后均为字符串（日期单元格也已转为文本），先整列解析，
+    # 格式与首行不一致而解析失败的少数值再逐个交给 pd.to_datetime 自动识别
+    times = df["交易时间"].str.strip()
+    parsed = pd.to_datetime(times, errors="coerce")
+
+    def to_date(value, parsed_value):
+        if not pd.isna(parsed_value):
+            return parsed_value.date()
         try:
-            amount = Decimal(amount_raw)
-        except:
+            return pd.to_datetime(value).date()
+        except (ValueError, TypeError, OverflowError):
+            return None
+
+    dates = [to_date(v, p) for v, p in zip(times, parsed)]
+
+    # 取出各列为列表，缺失的列使用空字符串
+    def column_values(col):
+        if col not in df.columns:
+            return [""] * len(df)
+        return df[col].fillna("").str.strip().tolist()
+
+    payees = column_values("交易对方")
+    notes = column_values("商品")
+    categories = column_values("交易类型")
+    accounts = column_values("支付方式")
+
+    for date, amount_raw, payee, note, category, account in zip(
+            dates, amounts, payees, notes, categories, accounts):
+        if date is None:
             continue
-        
-        # 处理日期：Excel 可能会将其读取为 datetime 对象或字符串
-        date_raw = str(row.get("交易时间")).strip()
+
         try:
-            # pd.to_datetime 能自动识别多种日期格式
-            date_obj = pd.to_datetime(date_raw)
-            date = date_obj.date()
-        except:
+            amount = Decimal(amount_raw)
+        except InvalidOperation:
             continue
 
         # 封装为字典，字段名需与 importer_main.py 保持一致
         transactions.append({
             "date": date,
-            "payee": str(row.get("交易对方", "")).strip(),
+            "payee": payee,
             "amount": amount,
-            "note": str(row.get("商品", "")).strip(),
-            "raw_category": str(row.get("交易类型", "")).strip(),
-            "raw_account": str(row.get("支付方式", "")).strip()
+            "note": note,
+            "raw_category": category,
+            "raw_account": account
         })
-    
-    return transactions
\ No newline at end of file
+
+    return transactions
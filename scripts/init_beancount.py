@@ -1,16 +1,10 @@
 # scripts/init_beancount.py
-import sys
-import json
-from pathlib import Path
+import re
 from datetime import date
 
-sys.dont_write_bytecode = True
+from config_loader import BASE_DIR, load_config
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-CONFIG_FILE = BASE_DIR / "config" / "config.json"
-
-with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-    config = json.load(f)
+config = load_config()
 
 BEAN_FILE = BASE_DIR / "equity.beancount"
 
@@ -21,6 +15,11 @@ EQUITY_ACCOUNT = "Equity:Opening-Balances"
 CURRENCY = "CNY"
 OPEN_DATE = date.today().isoformat()
 
+# 已开户账户：2024-01-01 open Assets:Bank
+OPEN_RE = re.compile(r"^\S+\s+open\s+(\S+)", re.M)
+# 已录入初始余额的账户：* "Opening Balance" 的下一行
+OPENING_BALANCE_RE = re.compile(r"\* \"Opening Balance\"\n\s+(\S+)")
+
 
 # ---------- helpers ----------
 
@@ -33,17 +32,26 @@ def read_content():
     return BEAN_FILE.read_text(encoding="utf-8")
 
 
-def account_exists(account: str, content: str) -> bool:
-    return f"open {account}" in content
+def parse_opened_accounts(content: str) -> set:
+    return set(OPEN_RE.findall(content))
+
+
+def parse_opening_balances(content: str) -> set:
+    return set(OPENING_BALANCE_RE.findall(content))
+
+
+def account_exists(account: str, opened: set) -> bool:
+    return account in opened
 
 
-def write_open(account: str, content: str, f):
-    if not account_exists(account, content):
+def write_open(account: str, opened: set, f):
+    if not account_exists(account, opened):
         f.write(f"{OPEN_DATE} open {account}\n")
+        opened.add(account)
 
 
-def opening_balance_exists(account: str, content: str) -> bool:
-    return f"* \"Opening Balance\"\n  {account}" in content
+def opening_balance_exists(account: str, balanced: set) -> bool:
+    return account in balanced
 
 
 def prompt_balance(account: str, label: str) -> float:
@@ -62,6 +70,9 @@ def prompt_balance(account: str, label: str) -> float:
 def init_beancount():
     ensure_file()
     content = read_content()
+    # 文件只解析一次，得到已开户账户和已有初始余额的账户
+    opened = parse_opened_accounts(content)
+    balanced = parse_opening_balances(content)
 
     print("\n请输入账户初始余额（CNY），直接回车表示 0\n")
 
@@ -69,21 +80,21 @@ def init_beancount():
         f.write("\n; ====== Auto Init Accounts ======\n\n")
 
         # ---------- open equity ----------
-        write_open(EQUITY_ACCOUNT, content, f)
+        write_open(EQUITY_ACCOUNT, opened, f)
 
         # ---------- open assets / liabilities ----------
         for acc in sorted(set(ASSET_MAPPING.values())):
-            write_open(acc, content, f)
+            write_open(acc, opened, f)
 
         # ---------- open classification accounts ----------
         for acc in CLASS_ACCOUNTS:
-            write_open(acc, content, f)
+            write_open(acc, opened, f)
 
         f.write("\n; ====== Opening Balances ======\n\n")
 
         # ---------- opening balance transactions ----------
         for name, acc in ASSET_MAPPING.items():
-            if opening_balance_exists(acc, content):
+            if opening_balance_exists(acc, balanced):
                 continue
 
             balance = prompt_balance(acc, name)
@@ -91,6 +102,7 @@ def init_beancount():
             f.write(f"{OPEN_DATE} * \"Opening Balance\"\n")
             f.write(f"  {acc}  {balance} {CURRENCY}\n")
             f.write(f"  {EQUITY_ACCOUNT}\n\n")
+            balanced.add(acc)
 
     print("\n✅ main.beancount 初始化完成")
 
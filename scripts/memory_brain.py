@@ -1,55 +1,318 @@
 # memory_brain.py
-import sys
-import json
-from pathlib import Path
-from openai import OpenAI
+import time
+import atexit
+import functools
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
-sys.dont_write_bytecode = True
+from config_loader import BASE_DIR, dumps as _dumps, load_config, loads as _loads
 
 # ---------- paths ----------
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-CONFIG_FILE = BASE_DIR / "config" / "config.json"
 CACHE_FILE = BASE_DIR / "config" / "mapping.json"
+# 新增映射先追加到日志文件，累计到一定数量或导入结束时再合并回 mapping.json
+JOURNAL_FILE = CACHE_FILE.with_suffix(".jsonl")
+COMPACT_THRESHOLD = 500
 
 # ---------- load config ----------
 
-with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-    config = json.load(f)
+config = load_config()
 
 openai_cfg = config["openai"]
-ALLOWED_ACCOUNTS = set(config.get("my_accounts", []))
+ALLOWED_ACCOUNTS = frozenset(config.get("my_accounts", []))
+# 资产映射关键词预先转小写，避免每条交易重复 lower()
+ASSET_KEYWORDS = tuple((kw.lower(), acc) for kw, acc in config.get("asset_mapping", {}).items())
 
 # ---------- OpenAI client (DeepSeek compatible) ----------
 
-client = OpenAI(
-    api_key=openai_cfg["api_key"],
-    base_url=openai_cfg["api_base"]
-)
-
 MODEL = openai_cfg["model"]
 
+# 最大尝试次数
+MAX_ATTEMPTS = 3
+
+# 批量预取 AI 建议时，每个请求包含的交易数
+AI_BATCH_SIZE = 20
+# 同时进行中的批量请求数（共用同一个连接池）
+AI_CONCURRENCY = 4
+
+# 按 (api_base, api_key) 缓存客户端，所有 MemoryBrain 实例共用同一个连接池
+_CLIENT_CACHE: Dict[Tuple[str, str], Any] = {}
+# 预取时多个线程可能同时首次调用 AI，创建客户端需加锁，保证只建一个连接池
+_CLIENT_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _retryable_exceptions() -> tuple:
+    """
+    可能可重试的异常类型，首次创建客户端时在锁内确定：
+    连接错误（含超时 APITimeoutError）与带 HTTP 状态码的接口错误（再由 _is_retryable 按状态码筛选）
+    """
+    from openai import APIConnectionError, APIStatusError
+    return (APIConnectionError, APIStatusError)
+
+
+# 与 openai SDK 内置重试一致：408 / 409 / 429 及所有 5xx（如 DeepSeek 过载时的 503）
+RETRYABLE_STATUS = frozenset({408, 409, 429})
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    return status is None or status in RETRYABLE_STATUS or status >= 500
+
+
+def _get_client(cfg: dict):
+    cache_key = (cfg["api_base"], cfg["api_key"])
+    client = _CLIENT_CACHE.get(cache_key)
+    if client is not None:
+        return client
+
+    with _CLIENT_LOCK:
+        client = _CLIENT_CACHE.get(cache_key)
+        if client is None:
+            # 延迟导入：映射全部命中缓存时无需加载 openai / httpx
+            import httpx
+            from openai import OpenAI
+
+            _retryable_exceptions()
+
+            # 显式配置连接池与 keep-alive，逐条分类时复用同一条 TCP/TLS 连接
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_keepalive_connections=20,
+                    max_connections=100,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            client = OpenAI(
+                api_key=cfg["api_key"],
+                base_url=cfg["api_base"],
+                http_client=http_client,
+                max_retries=0,  # 重试由 _request_completion 统一负责
+            )
+            _CLIENT_CACHE[cache_key] = client
+    return client
+
+
+def _close_all_clients():
+    for client in _CLIENT_CACHE.values():
+        client.close()
+    _CLIENT_CACHE.clear()
+
+
+atexit.register(_close_all_clients)
+
 # ---------- Memory Brain ----------
 
 class MemoryBrain:
     def __init__(self):
+        self._dirty = 0
         self.mapping = self._load_mapping()
+        # 账户集合 -> 排序结果 / 拼接后的 prompt 片段（账户集合在一次导入中基本不变）
+        self._sorted_accounts_cache: Dict[frozenset, Tuple[str, ...]] = {}
+        self._accounts_text_cache: Dict[frozenset, str] = {}
+        # 批量预取得到的 AI 建议，key 与 mapping 相同
+        self._suggestions: Dict[str, str] = {}
 
     def _load_mapping(self) -> dict:
+        mapping = {}
         if CACHE_FILE.exists():
-            with open(CACHE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+            mapping = _loads(CACHE_FILE.read_bytes())
+
+        # 回放上次未合并的日志（例如导入中途退出）
+        if JOURNAL_FILE.exists():
+            with open(JOURNAL_FILE, "rb") as f:
+                for line in f:
+                    try:
+                        mapping.update(_loads(line))
+                        self._dirty += 1
+                    except ValueError:
+                        continue  # 中断时写了一半的行
+        return mapping
+
+    def _remember(self, key: str, account: str):
+        """
+        记录一条新映射：只追加一行日志，不重写整个 mapping.json
+        """
+        self.mapping[key] = account
+        with open(JOURNAL_FILE, "ab") as f:
+            f.write(_dumps({key: account}) + b"\n")
+        self._dirty += 1
+        if self._dirty >= COMPACT_THRESHOLD:
+            self._save_mapping()
 
     def _save_mapping(self):
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.mapping, f, ensure_ascii=False, indent=2)
+        """
+        将内存中的映射完整写回 mapping.json，并清空日志
+        """
+        if not self._dirty:
+            return
+        temp_file = CACHE_FILE.with_suffix(".tmp")
+        temp_file.write_bytes(_dumps(self.mapping, indent=True))
+        temp_file.replace(CACHE_FILE)
+        if JOURNAL_FILE.exists():
+            JOURNAL_FILE.unlink()
+        self._dirty = 0
+
+    def _request_completion(self, prompt: str) -> str:
+        """
+        调用 chat/completions，遇到超时/连接错误、限流或服务端错误（5xx）时指数退避重试
+        """
+        # 先取客户端：创建失败（如未安装 openai）时直接抛出，不进入重试逻辑
+        client = self.client
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                resp = client.chat.completions.create(
+                    model=MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0,
+                )
+                return resp.choices[0].message.content
+            except _retryable_exceptions() as e:
+                if attempt == MAX_ATTEMPTS - 1 or not _is_retryable(e):
+                    raise
+                delay = min(60, 4 * 2 ** attempt) + random.uniform(0, 1)
+                print(f"⚠️ AI 接口暂不可用（{e}），{delay:.1f} 秒后重试...")
+                time.sleep(delay)
+
+    @property
+    def client(self):
+        # 首次调用 AI 时才创建（共享的）客户端
+        return _get_client(openai_cfg)
+
+    @staticmethod
+    def _make_key(payee: str, raw_category: str) -> str:
+        return f"{payee.strip()}|{raw_category.strip()}"
+
+    @staticmethod
+    def _match_asset_account(payee: str) -> Optional[str]:
+        """
+        资产映射检测（转账处理）：商户名包含资产关键词时返回对应资产账户
+        """
+        payee_lower = payee.lower()
+        for kw, acc in ASSET_KEYWORDS:
+            if kw in payee_lower:
+                return acc
+        return None
+
+    def _sorted_accounts(self, accounts) -> Tuple[str, ...]:
+        accounts_key = frozenset(accounts)
+        sorted_accounts = self._sorted_accounts_cache.get(accounts_key)
+        if sorted_accounts is None:
+            sorted_accounts = tuple(sorted(accounts_key))
+            self._sorted_accounts_cache[accounts_key] = sorted_accounts
+        return sorted_accounts
+
+    def _accounts_text(self, accounts) -> str:
+        accounts_key = frozenset(accounts)
+        accounts_text = self._accounts_text_cache.get(accounts_key)
+        if accounts_text is None:
+            accounts_text = "\n".join(self._sorted_accounts(accounts_key))
+            self._accounts_text_cache[accounts_key] = accounts_text
+        return accounts_text
+
+    def _ai_classify_batch(self, items: List[Tuple[str, dict]]) -> Dict[str, str]:
+        """
+        一次请求为多条交易给出建议账户，返回 {key: 建议账户}（仅包含合法结果）
+        """
+        allowed_by_key = {}
+        for key, tx in items:
+            asset_account = self._match_asset_account(tx["payee"])
+            allowed_by_key[key] = ALLOWED_ACCOUNTS | {asset_account} if asset_account else ALLOWED_ACCOUNTS
+
+        accounts_text = self._accounts_text(frozenset().union(*allowed_by_key.values()))
+        items_text = "\n".join(
+            f"{i}. 账单原始分类：{tx['raw_category']}；商户名称：{tx['payee']}；商品信息：{tx.get('note', '')}"
+            for i, (_, tx) in enumerate(items)
+        )
+
+        prompt = f"""
+你是一个专业的 Beancount 记账分类助手。
+
+【待分类交易】
+{items_text}
+
+【待选账户列表】
+{accounts_text}
+
+【任务】
+请为每一条交易从上述“待选账户列表”中选择一个最合适的账户。
+
+【规则 - 必须遵守】
+1. 必须优先参考“账单原始分类”进行逻辑推断。
+2. 必须【只能】从提供的“待选账户列表”中选择。
+3. 如果无法确定，请选择列表中的支出类账户（Expenses: 开头）。
+4. 每条交易返回一项，"i" 为上面的序号（从 0 开始），"payee" 原样抄写该条的商户名称。
+5. 只返回 JSON 数组，格式为 [{{"i": 序号, "payee": "商户名称", "account": "账户名"}}]，不要包含任何解释或多余文字。
+"""
+
+        try:
+            content = self._request_completion(prompt).strip()
+            # 兼容模型用 ```json 代码块包裹结果的情况
+            if content.startswith("```"):
+                content = content.strip("`")
+                content = content[content.find("["):]
+            results = _loads(content.encode("utf-8"))
+        except Exception as e:
+            print(f"❌ AI 批量分类异常: {e}")
+            return {}
+
+        # 序号必须与待分类交易一一对应，且回显的商户名称一致；
+        # 否则（如模型从 1 开始编号）整批丢弃，避免把 A 的账户错配给 B
+        accounts_by_index = {}
+        try:
+            for result in results:
+                i = int(result["i"])
+                if not 0 <= i < len(items) or i in accounts_by_index:
+                    raise ValueError(f"序号 {result['i']} 越界或重复")
+                if str(result["payee"]).strip() != items[i][1]["payee"].strip():
+                    raise ValueError(f"序号 {i} 的商户名称不匹配")
+                accounts_by_index[i] = str(result["account"]).strip()
+            if len(accounts_by_index) != len(items):
+                raise ValueError(f"返回 {len(accounts_by_index)} 条，应为 {len(items)} 条")
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"❌ AI 批量分类结果无法与交易对应（{e}），本批改为逐条分类")
+            return {}
+
+        suggestions = {}
+        for i, account in accounts_by_index.items():
+            key = items[i][0]
+            if account in allowed_by_key[key]:
+                suggestions[key] = account
+        return suggestions
+
+    def prefetch(self, txs: List[dict]):
+        """
+        批量预取：把未缓存的 (商户, 原始分类) 按 AI_BATCH_SIZE 合并请求，
+        之后 classify 直接使用预取的建议，不再逐条调用 AI
+        """
+        pending = {}
+        for tx in txs:
+            key = self._make_key(tx.get("payee", ""), tx.get("raw_category", ""))
+            if key not in self.mapping and key not in self._suggestions:
+                pending.setdefault(key, tx)
+
+        if not pending:
+            return
+
+        items = list(pending.items())
+        batches = [items[start:start + AI_BATCH_SIZE] for start in range(0, len(items), AI_BATCH_SIZE)]
+        print(f"   [系统] 🤖 正在为 {len(items)} 个新商户批量获取 AI 建议...")
+
+        if len(batches) == 1:
+            self._suggestions.update(self._ai_classify_batch(batches[0]))
+            return
+
+        # 多个批次并发请求，等待时间从 N 个往返缩短到约 N / AI_CONCURRENCY 个
+        with ThreadPoolExecutor(max_workers=min(AI_CONCURRENCY, len(batches))) as executor:
+            for suggestions in executor.map(self._ai_classify_batch, batches):
+                self._suggestions.update(suggestions)
 
     def _ai_classify(self, payee: str, note: str, raw_category: str, current_allowed: set) -> str:
         # 获取所有合法账户（my_accounts + 本次匹配到的 asset_mapping 账户）
-        # 注意：这里需要确保你已经按照上一条回复修改了 classify 以便传入 dynamic_accounts
-        
-        accounts_text = "\n".join(sorted(list(current_allowed)))
+        accounts_text = self._accounts_text(current_allowed)
 
         prompt = f"""
 你是一个专业的 Beancount 记账分类助手。
@@ -73,12 +336,8 @@ class MemoryBrain:
 """
 
         try:
-            resp = client.chat.completions.create(
-                model=MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-            )
-            return resp.choices[0].message.content.strip().replace('"', '').replace('。', '')
+            content = self._request_completion(prompt)
+            return content.strip().replace('"', '').replace('。', '')
         except Exception as e:
             print(f"❌ AI 接口异常: {e}")
             return "Expenses:Unknown"
@@ -98,7 +357,7 @@ class MemoryBrain:
 
             print(f"❌ 非法账户：'{final}'，该账户不在 my_accounts 或本次资产映射中。")
             print("合法选项示例（前10个）：")
-            for acc in sorted(list(current_allowed))[:10]:
+            for acc in self._sorted_accounts(current_allowed)[:10]:
                 print(f"  - {acc}")
 
     def classify(self, payee: str, raw_category: str, note: str, raw_account: str) -> str:
@@ -106,35 +365,32 @@ class MemoryBrain:
         分类主逻辑
         """
         # 1. 检查缓存 (Key 包含原始分类，确保分类不同时能区分)
-        key = f"{payee.strip()}|{raw_category.strip()}"
-        if key in self.mapping:
-            return self.mapping[key]
+        key = self._make_key(payee, raw_category)
+        cached = self.mapping.get(key)
+        if cached is not None:
+            return cached
 
         print(f"\n🆕 发现新商户：{payee}")
         print(f"   账单原始分类：{raw_category}")
 
         # 2. 构建本次交易合法的账户集合
-        current_allowed = set(config.get("my_accounts", []))
-        
+        current_allowed = ALLOWED_ACCOUNTS
+
         # 资产映射检测（转账处理）
-        matched_asset_account = None
-        for kw, acc in config.get("asset_mapping", {}).items():
-            if kw.lower() in payee.lower():
-                matched_asset_account = acc
-                break
-        
+        matched_asset_account = self._match_asset_account(payee)
         if matched_asset_account:
-            current_allowed.add(matched_asset_account)
+            current_allowed = ALLOWED_ACCOUNTS | {matched_asset_account}
             print(f"ℹ️ 检测到资产关键词，允许选择：{matched_asset_account}")
 
-        # 3. 调用 AI 分类 (传入所有上下文)
-        suggested = self._ai_classify(payee, note, raw_category, current_allowed)
+        # 3. 优先使用批量预取的建议，否则单独调用 AI 分类 (传入所有上下文)
+        suggested = self._suggestions.pop(key, None)
+        if suggested is None:
+            suggested = self._ai_classify(payee, note, raw_category, current_allowed)
 
         # 4. 人工确认 (调用上面定义的函数)
         final_account = self._confirm_account_dynamic(suggested, current_allowed)
 
-        # 5. 保存映射
-        self.mapping[key] = final_account
-        self._save_mapping()
+        # 5. 保存映射（追加日志，导入结束时统一合并）
+        self._remember(key, final_account)
 
         return final_account